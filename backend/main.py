@@ -1,13 +1,20 @@
 import yfinance as yf
+import asyncio
+import hashlib
 import sqlite3
+import threading
 import re
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Union
-from fastapi import FastAPI, HTTPException
+from typing import List, Dict, Optional, Union, Callable
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 import json
+import os
+import numpy as np
 import pandas as pd
+from collections import Counter
 from dataclasses import dataclass
 
 # =====================================================================
@@ -40,141 +47,182 @@ class Intent: #represents the interpreted intent of the user's message
 # 2. DATABASE LAYER: separates the storage logic from business logic, ensures all data is persisted and retrieval
 # =====================================================================
 
+# SQL used on every request, kept at module level so the queries can be read in one place
+# and shared by the methods below
+_INSERT_HOLDING_SQL = """
+    INSERT OR REPLACE INTO holdings (user_id, symbol, quantity, buy_price, buy_date)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_INSERT_TX_SQL = """
+    INSERT INTO transactions (user_id, symbol, action, quantity, price, date)
+    VALUES (?, ?, 'BUY', ?, ?, ?)
+"""
+
+_SELECT_PORTFOLIO_SQL = """
+    SELECT symbol, quantity, buy_price, buy_date 
+    FROM holdings 
+    WHERE user_id = ?
+"""
+
+_INSERT_ALERT_SQL = """
+    INSERT INTO alerts (user_id, symbol, condition, price, active, created_date)
+    VALUES (?, ?, ?, ?, 1, ?)
+"""
+
+_SELECT_ALERTS_SQL = """
+    SELECT symbol, condition, price, active 
+    FROM alerts 
+    WHERE user_id = ? AND active = 1
+"""
+
+_HOLDINGS_FINGERPRINT_SQL = "SELECT symbol, id FROM holdings WHERE user_id = ? ORDER BY id"
+
+_ALERTS_FINGERPRINT_SQL = "SELECT COUNT(*), MAX(id) FROM alerts WHERE user_id = ? AND active = 1"
+
 class PortfolioDatabase:
     def __init__(self, db_path: str = "portfolio.db"): #initialize the database connection and create tables
         self.db_path = db_path
+        # one connection shared by every request; autocommit mode so transactions are explicit BEGIN/COMMIT
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()  # FastAPI runs sync work in a threadpool, serialize access to the connection
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-64000")  # 64MB page cache
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256MB memory-mapped I/O
         self.init_database()
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Holdings table: stores user stocks
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS holdings (
-                id INTEGER PRIMARY KEY,
-                user_id TEXT,
-                symbol TEXT,
-                quantity REAL,
-                buy_price REAL,
-                buy_date TEXT,
-                UNIQUE(user_id, symbol)
-            )
-        """)
-        
-        # Alerts table: stores price alerts for each stock
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY,
-                user_id TEXT,
-                symbol TEXT,
-                condition TEXT,
-                price REAL,
-                active BOOLEAN,
-                created_date TEXT
-            )
-        """)
-        
-        # Transaction log: logs all buy/sell actions for history/auditing
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY,
-                user_id TEXT,
-                symbol TEXT,
-                action TEXT,
-                quantity REAL,
-                price REAL,
-                date TEXT
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN")
+            
+            # Holdings table: stores user stocks
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS holdings (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT,
+                    symbol TEXT,
+                    quantity REAL,
+                    buy_price REAL,
+                    buy_date TEXT,
+                    UNIQUE(user_id, symbol)
+                )
+            """)
+            
+            # Alerts table: stores price alerts for each stock
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT,
+                    symbol TEXT,
+                    condition TEXT,
+                    price REAL,
+                    active BOOLEAN,
+                    created_date TEXT
+                )
+            """)
+            
+            # Transaction log: logs all buy/sell actions for history/auditing
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS transactions (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT,
+                    symbol TEXT,
+                    action TEXT,
+                    quantity REAL,
+                    price REAL,
+                    date TEXT
+                )
+            """)
+
+            # Indexes for the per-user lookups; the alerts index is partial since only active alerts are queried
+            # holdings needs none: the UNIQUE(user_id, symbol) autoindex already serves WHERE user_id = ?
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_user_active ON alerts(user_id, active) WHERE active = 1")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date DESC)")
+
+            cursor.execute("COMMIT")
+
+    # closes the shared connection, used on application shutdown
+    def close(self):
+        with self._lock:
+            self.conn.close()
 
     # inserts a new stock holding to the user's portfolio and logs the transaction
     def add_holding(self, user_id: str, symbol: str, quantity: float, buy_price: float):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO holdings (user_id, symbol, quantity, buy_price, buy_date)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user_id, symbol, quantity, buy_price, datetime.now().isoformat()))
-        
-        # Log transaction
-        cursor.execute("""
-            INSERT INTO transactions (user_id, symbol, action, quantity, price, date)
-            VALUES (?, ?, 'BUY', ?, ?, ?)
-        """, (user_id, symbol, quantity, buy_price, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        now = datetime.now().isoformat()
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(_INSERT_HOLDING_SQL, (user_id, symbol, quantity, buy_price, now))
+                cursor.execute(_INSERT_TX_SQL, (user_id, symbol, quantity, buy_price, now))  # Log transaction
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
     
     # retrieves the user's current portfolio holdings
     def get_portfolio(self, user_id: str) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT symbol, quantity, buy_price, buy_date 
-            FROM holdings 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        holdings = []
-        for row in cursor.fetchall():
-            holdings.append({
-                "symbol": row[0],
-                "quantity": row[1],
-                "buy_price": row[2],
-                "buy_date": row[3]
-            })
-        
-        conn.close()
-        return holdings
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(_SELECT_PORTFOLIO_SQL, (user_id,))
+            rows = cursor.fetchall()
+        
+        # plain tuples with fixed keys are cheaper than going through sqlite3.Row lookups
+        return [
+            {"symbol": symbol, "quantity": quantity, "buy_price": buy_price, "buy_date": buy_date}
+            for symbol, quantity, buy_price, buy_date in rows
+        ]
 
     # adds a new price alert for a stock
     def add_alert(self, user_id: str, symbol: str, condition: str, price: float):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO alerts (user_id, symbol, condition, price, active, created_date)
-            VALUES (?, ?, ?, ?, 1, ?)
-        """, (user_id, symbol, condition, price, datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        now = datetime.now().isoformat()  # taken before locking so the critical section is just the insert
+        with self._lock:
+            self.conn.execute(_INSERT_ALERT_SQL, (user_id, symbol, condition, price, now))
 
     # retrieves all active price alerts for a user
     def get_alerts(self, user_id: str) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT symbol, condition, price, active 
-            FROM alerts 
-            WHERE user_id = ? AND active = 1
-        """, (user_id,))
-        
-        alerts = []
-        for row in cursor.fetchall():
-            alerts.append({
-                "symbol": row[0],
-                "condition": row[1],
-                "price": row[2],
-                "active": bool(row[3])
-            })
-        
-        conn.close()
-        return alerts
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(_SELECT_ALERTS_SQL, (user_id,))
+            rows = cursor.fetchall()
+        
+        return [
+            {"symbol": symbol, "condition": condition, "price": price, "active": bool(active)}
+            for symbol, condition, price, active in rows
+        ]
+
+    # cheap (symbol, id) summary of a user's holdings that changes whenever a holding is added or replaced
+    # (INSERT OR REPLACE deletes and reinserts, so the row gets a new, larger id)
+    def holdings_fingerprint(self, user_id: str) -> List[tuple]:
+        with self._lock:
+            return self.conn.execute(_HOLDINGS_FINGERPRINT_SQL, (user_id,)).fetchall()
+
+    # cheap summary of a user's active alerts, used for conditional GETs
+    def alerts_fingerprint(self, user_id: str) -> tuple:
+        with self._lock:
+            return self.conn.execute(_ALERTS_FINGERPRINT_SQL, (user_id,)).fetchone()
 
 # =====================================================================
 # 3. NLP & COMMAND PROCESSOR: interprets user messages, extracts intents and entities, into structured instructions
 # =====================================================================
 
+_TOKEN_SPLIT_RE = re.compile(r'\W+')  # splits messages into words for keyword lookup
+_SYMBOL_TOKEN_RE = re.compile(r'\$?[A-Za-z][\w.\-]*')  # candidate symbols, keeps "$" prefixes and "BRK.B"/"BRK-B"
+_NUM_RE = re.compile(r'\d+\.?\d*')  # quantities and prices
+
 class NLPProcessor:
-    def __init__(self):
+    def __init__(self, tickers_path: str = os.path.join(os.path.dirname(__file__), "tickers.json")):
+        # known ticker universe, so words like "THE" or "BUY" are not mistaken for symbols
+        # word_tickers (COST, SHOP, CAT, ...) are also ordinary words, so they only count when
+        # written in uppercase; any symbol, listed or not, can be given explicitly as "$ROKU"
+        with open(tickers_path) as f:
+            universe = json.load(f)
+        self._tickers = frozenset(universe["tickers"])
+        self._word_tickers = frozenset(universe["word_tickers"])
         self.intent_patterns = { #map user input patterns(regex) to intents
             "show_portfolio": [
                 r"show.*portfolio", r"my.*holdings", r"portfolio.*summary",
@@ -201,17 +249,46 @@ class NLPProcessor:
                 r"what.*is.*trading", r".*price.*now"
             ]
         }
+        # compile once so classify_intent doesn't go through re's pattern cache on every message
+        self.intent_patterns = {
+            intent: [re.compile(p) for p in patterns]
+            for intent, patterns in self.intent_patterns.items()
+        }
+        
+        # keywords that vote for an intent when none of the patterns above match, e.g. "NVDA and AMD comparison"
+        # words that also fit other requests ("alerts", "watch", "add", "overview", ...) are deliberately left out
+        self.intent_keywords = {
+            "show_portfolio": ["portfolio", "holdings", "positions"],
+            "add_alert": ["alert", "notify", "remind"],
+            "compare_stocks": ["compare", "comparison", "vs", "versus", "difference", "better"],
+            "simulate": ["simulate", "simulation", "scenario", "hypothetically"],
+            "add_holding": ["bought", "purchased", "acquired"],
+            "stock_price": ["price", "quote", "trading", "worth", "doing", "today"]
+        }
+        self._keyword_intents = { #word -> intent, so scoring is one dict probe per word
+            word: intent
+            for intent, words in self.intent_keywords.items()
+            for word in words
+        }
     
     def extract_entities(self, text: str) -> Dict:
         entities = {}
         
-        # Extract stock symbols (3-4 letter uppercase)
-        symbols = re.findall(r'\b[A-Z]{2,4}\b', text.upper())
+        # Extract stock symbols (words that are known tickers)
+        symbols = []
+        for token in _SYMBOL_TOKEN_RE.findall(text):
+            token = token.rstrip('.-')  # trailing punctuation, e.g. "AAPL."
+            word = token.lstrip('$')
+            symbol = word.upper().replace('.', '-')  # Yahoo spells class shares as BRK-B
+            if token.startswith('$') or symbol in self._tickers:
+                symbols.append(symbol)
+            elif symbol in self._word_tickers and word.isupper():
+                symbols.append(symbol)
         if symbols:
             entities['symbols'] = symbols
         
         # Extract numbers (quantities, prices)
-        numbers = re.findall(r'\d+\.?\d*', text)
+        numbers = _NUM_RE.findall(text)
         if numbers:
             entities['numbers'] = [float(n) for n in numbers]
         
@@ -225,21 +302,35 @@ class NLPProcessor:
 
     # matches the input text to an intent
     # returns an Intent object with action, entities, and confidence
-    def classify_intent(self, text: str) -> Intent:
+    # can_handle(action, entities) lets the caller veto a keyword vote whose handler lacks the entities it needs
+    def classify_intent(self, text: str, can_handle: Callable[[str, Dict], bool] = lambda action, entities: True) -> Intent:
         text_lower = text.lower()
+        entities = self.extract_entities(text)
         
         for intent, patterns in self.intent_patterns.items():
             for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    entities = self.extract_entities(text)
+                if pattern.search(text_lower):
                     return Intent(
                         action=intent,
                         entities=entities,
                         confidence=0.8
                     )
         
+        # No pattern matched: let the keywords vote, and only trust a clear majority
+        votes = Counter(
+            self._keyword_intents[word] for word in _TOKEN_SPLIT_RE.split(text_lower) if word in self._keyword_intents
+        )
+        if votes:
+            action, count = votes.most_common(1)[0]
+            share = count / sum(votes.values())
+            if share > 0.5 and can_handle(action, entities):
+                return Intent(
+                    action=action,
+                    entities=entities,
+                    confidence=round(0.5 + 0.2 * share, 2)  # between the default (0.5) and a pattern match (0.8)
+                )
+        
         # Default intent
-        entities = self.extract_entities(text)
         return Intent(
             action="stock_price",
             entities=entities,
@@ -251,41 +342,183 @@ class NLPProcessor:
 # =====================================================================
 
 class MarketDataAPI:
-    @staticmethod
-    def get_stock_info(symbol: str) -> Dict:
+    QUOTE_TTL = 30  # seconds a cached quote stays fresh
+    METADATA_TTL = 3600  # seconds cached company metadata (sector, market cap, P/E) stays fresh
+
+    def __init__(self):
+        self._ticker_cache: Dict[str, yf.Ticker] = {}  # symbol -> Ticker, reused across requests
+        self._quote_cache: Dict[str, tuple] = {}  # symbol -> (fetched_at, quote)
+        self._metadata_cache: Dict[str, tuple] = {}  # symbol -> (fetched_at, metadata)
+        self._name_cache: Dict[str, str] = {}  # symbol -> shortName, company names rarely change
+        self._quote_ttls: Dict[str, float] = {}  # per-symbol TTL overrides for prefetched symbols
+
+    # returns a memoized Ticker so repeated lookups share one object
+    def _get_ticker(self, symbol: str) -> yf.Ticker:
+        ticker = self._ticker_cache.get(symbol)
+        if ticker is None:
+            ticker = yf.Ticker(symbol)
+            self._ticker_cache[symbol] = ticker
+        return ticker
+
+    # returns the cached quote for a symbol if it is still within the TTL
+    def _cached_quote(self, symbol: str) -> Optional[Dict]:
+        cached = self._quote_cache.get(symbol)
+        if cached and time.monotonic() - cached[0] < self._quote_ttls.get(symbol, self.QUOTE_TTL):
+            return cached[1]
+        return None
+
+    # returns when the cached quote for a symbol was fetched, or None if there is no fresh quote
+    def quote_timestamp(self, symbol: str) -> Optional[float]:
+        cached = self._quote_cache.get(symbol)
+        if cached and time.monotonic() - cached[0] < self._quote_ttls.get(symbol, self.QUOTE_TTL):
+            return cached[0]
+        return None
+
+    # returns the live price and day change from fast_info, skipping the heavy .info scrape
+    def get_quote(self, symbol: str) -> Dict:
+        cached = self._cached_quote(symbol)
+        if cached is not None:
+            return dict(cached)  # copy so callers can annotate the result without touching the cache
+        
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            hist = stock.history(period="1d")
+            fast_info = self._get_ticker(symbol).fast_info
+            current_price = fast_info.last_price
+            open_price = fast_info.open
             
-            if hist.empty:
+            if current_price is None or pd.isna(current_price):
                 return {"error": f"No data found for {symbol}"}
             
-            current_price = hist['Close'].iloc[-1]
-            
-            return {
+            quote = {
                 "symbol": symbol,
-                "name": info.get("shortName", "N/A"),
                 "current_price": round(current_price, 2),
+                "day_change": round(current_price - open_price, 2) if open_price is not None and not pd.isna(open_price) else 0
+            }
+            self._quote_cache[symbol] = (time.monotonic(), quote)  # only successful quotes are cached
+            return dict(quote)
+        except Exception as e:
+            return {"error": f"Error fetching data for {symbol}: {str(e)}"}
+
+    # returns company details from .info, only used where the user actually sees them
+    def get_metadata(self, symbol: str) -> Dict:
+        cached = self._metadata_cache.get(symbol)
+        if cached and time.monotonic() - cached[0] < self.METADATA_TTL:
+            return dict(cached[1])
+        
+        try:
+            info = self._get_ticker(symbol).info
+            metadata = {
+                "name": info.get("shortName", "N/A"),
                 "currency": info.get("currency", "USD"),
                 "sector": info.get("sector", "N/A"),
                 "market_cap": info.get("marketCap", 0),
-                "pe_ratio": info.get("trailingPE", "N/A"),
-                "day_change": round(hist['Close'].iloc[-1] - hist['Open'].iloc[-1], 2) if len(hist) > 0 else 0
+                "pe_ratio": info.get("trailingPE", "N/A")
             }
+            self._metadata_cache[symbol] = (time.monotonic(), metadata)
+            self._name_cache[symbol] = metadata["name"]
+            return dict(metadata)
         except Exception as e:
             return {"error": f"Error fetching data for {symbol}: {str(e)}"}
+
+    # combines the quote and metadata into the full stock summary shown to the user
+    def get_stock_info(self, symbol: str) -> Dict:
+        quote = self.get_quote(symbol)
+        if 'error' in quote:
+            return quote
+        
+        metadata = self.get_metadata(symbol)
+        if 'error' in metadata:
+            return metadata
+        
+        return {
+            "symbol": symbol,
+            "name": metadata["name"],
+            "current_price": quote["current_price"],
+            "currency": metadata["currency"],
+            "sector": metadata["sector"],
+            "market_cap": metadata["market_cap"],
+            "pe_ratio": metadata["pe_ratio"],
+            "day_change": quote["day_change"]
+        }
+
+    # keeps quotes for symbols that are always needed for ttl seconds instead of QUOTE_TTL
+    def set_quote_ttl(self, symbols: List[str], ttl: float):
+        for symbol in symbols:
+            self._quote_ttls[symbol] = ttl
+
+    # creates all tickers not yet seen with one yf.Tickers call before they are fetched in parallel
+    def prime_tickers(self, symbols: List[str]):
+        missing = [s for s in symbols if s not in self._ticker_cache]
+        if missing:
+            try:
+                self._ticker_cache.update(yf.Tickers(" ".join(missing)).tickers)
+            except Exception:
+                pass  # _get_ticker falls back to creating tickers one at a time
     
-    @staticmethod
-    def get_historical_data(symbol: str, period: str = "1mo") -> Dict:
+    # returns last closing prices for many symbols using a single batched yf.download call
+    # symbols with no data are left out of the result
+    def get_last_prices(self, symbols: List[str]) -> Dict[str, float]:
+        prices = {}
+        missing = []
+        
+        for symbol in dict.fromkeys(symbols):
+            cached_quote = self._cached_quote(symbol)
+            if cached_quote is not None:
+                prices[symbol] = cached_quote['current_price']
+            else:
+                missing.append(symbol)
+        
+        if not missing:
+            return prices
+        
         try:
-            stock = yf.Ticker(symbol)
+            df = yf.download(missing, period="1d", group_by='ticker', threads=True, progress=False)
+        except Exception:
+            return prices
+        
+        for symbol in missing:
+            try:
+                # single-ticker downloads may come back without the ticker column level
+                frame = df[symbol] if isinstance(df.columns, pd.MultiIndex) else df
+                frame = frame.dropna(subset=['Close'])
+            except KeyError:
+                continue
+            if frame.empty:
+                continue
+            
+            last = frame.iloc[-1]
+            quote = {
+                "symbol": symbol,
+                "current_price": round(float(last['Close']), 2),
+                "day_change": round(float(last['Close'] - last['Open']), 2)
+            }
+            self._quote_cache[symbol] = (time.monotonic(), quote)  # also serves later get_quote calls
+            prices[symbol] = quote['current_price']
+        
+        return prices
+
+    # whether the company name for a symbol has been resolved (failed lookups are not remembered)
+    def has_name(self, symbol: str) -> bool:
+        return symbol in self._name_cache
+
+    # returns the company name, fetching .info only the first time a symbol is seen
+    def get_name(self, symbol: str) -> str:
+        name = self._name_cache.get(symbol)
+        if name is None:
+            metadata = self.get_metadata(symbol)
+            if 'error' in metadata:
+                return "N/A"  # don't remember failures, retry on the next request
+            name = metadata['name']
+        return name
+    
+    def get_historical_data(self, symbol: str, period: str = "1mo") -> Dict:
+        try:
+            stock = self._get_ticker(symbol)
             hist = stock.history(period=period)
             
             return {
                 "symbol": symbol,
                 "period": period,
-                "data": hist.to_dict('records')[-10:]  # Last 10 records
+                "data": hist.tail(10).to_dict('records')  # Last 10 records, sliced before converting
             }
         except Exception as e:
             return {"error": f"Error fetching historical data: {str(e)}"}
@@ -295,46 +528,74 @@ class MarketDataAPI:
 # =====================================================================
 
 class AnalyticsEngine:
+    MAX_CONCURRENT_FETCHES = 8  # cap parallel Yahoo requests to avoid rate limiting
+
     def __init__(self, db: PortfolioDatabase, market_api: MarketDataAPI):
         self.db = db
         self.market_api = market_api
+        self._fetch_limit = asyncio.Semaphore(self.MAX_CONCURRENT_FETCHES)
+    
+    # runs a blocking market data call for each symbol in worker threads, at most MAX_CONCURRENT_FETCHES at a time
+    async def _fetch_all(self, fetch, symbols: List[str]) -> Dict[str, Dict]:
+        async def limited(symbol):
+            async with self._fetch_limit:
+                return await asyncio.to_thread(fetch, symbol)
+        
+        results = await asyncio.gather(*(limited(symbol) for symbol in symbols))
+        return dict(zip(symbols, results))
+    
+    # warms the quote and metadata caches for symbols that are always needed, fetching them in parallel
+    async def prefetch(self, symbols: List[str], ttl: float):
+        self.market_api.set_quote_ttl(symbols, ttl)
+        self.market_api.prime_tickers(symbols)
+        await self._fetch_all(self.market_api.get_stock_info, symbols)
     
     # loops through user holdings, gets live prices from marketdatapi, and then calculates
-    def calculate_portfolio_value(self, user_id: str) -> Dict: 
-        holdings = self.db.get_portfolio(user_id)
+    async def calculate_portfolio_value(self, user_id: str) -> Dict: 
+        holdings = await asyncio.to_thread(self.db.get_portfolio, user_id)
         
         if not holdings:
             return {"message": "No holdings found in portfolio"}
         
-        total_value = 0
-        total_cost = 0
-        portfolio_details = []
+        symbols = [h['symbol'] for h in holdings]
+        prices = await asyncio.to_thread(self.market_api.get_last_prices, symbols)
+        names = await self._fetch_all(self.market_api.get_name, [s for s in symbols if s in prices])
         
-        for holding in holdings:
-            stock_info = self.market_api.get_stock_info(holding['symbol'])
-            
-            if 'error' in stock_info:
-                continue
-                
-            current_value = holding['quantity'] * stock_info['current_price']
-            cost_basis = holding['quantity'] * holding['buy_price']
-            profit_loss = current_value - cost_basis
-            
-            portfolio_details.append({
+        priced = [h for h in holdings if h['symbol'] in prices]  # holdings without a live price are skipped
+        
+        # compute every column at once on NumPy arrays instead of per holding in Python
+        quantity = np.fromiter((h['quantity'] for h in priced), dtype=np.float64, count=len(priced))
+        buy_price = np.fromiter((h['buy_price'] for h in priced), dtype=np.float64, count=len(priced))
+        current_price = np.fromiter((prices[h['symbol']] for h in priced), dtype=np.float64, count=len(priced))
+        
+        current_value = quantity * current_price
+        cost_basis = quantity * buy_price
+        profit_loss = current_value - cost_basis
+        profit_loss_pct = np.divide(profit_loss * 100, cost_basis, out=np.zeros_like(profit_loss), where=cost_basis > 0)
+        
+        portfolio_details = [
+            {
                 "symbol": holding['symbol'],
-                "name": stock_info['name'],
+                "name": names[holding['symbol']],
                 "quantity": holding['quantity'],
                 "buy_price": holding['buy_price'],
-                "current_price": stock_info['current_price'],
-                "current_value": round(current_value, 2),
-                "cost_basis": round(cost_basis, 2),
-                "profit_loss": round(profit_loss, 2),
-                "profit_loss_pct": round((profit_loss / cost_basis) * 100, 2) if cost_basis > 0 else 0
-            })
-            
-            total_value += current_value
-            total_cost += cost_basis
+                "current_price": prices[holding['symbol']],
+                "current_value": value,
+                "cost_basis": cost,
+                "profit_loss": pl,
+                "profit_loss_pct": pl_pct
+            }
+            for holding, value, cost, pl, pl_pct in zip(
+                priced,
+                np.round(current_value, 2).tolist(),
+                np.round(cost_basis, 2).tolist(),
+                np.round(profit_loss, 2).tolist(),
+                np.round(profit_loss_pct, 2).tolist()
+            )
+        ]
         
+        total_value = float(current_value.sum())
+        total_cost = float(cost_basis.sum())
         total_profit_loss = total_value - total_cost
         
         return {
@@ -345,23 +606,29 @@ class AnalyticsEngine:
             "holdings": portfolio_details
         }
     
-    def compare_stocks(self, symbols: List[str]) -> Dict:
+    async def compare_stocks(self, symbols: List[str]) -> Dict:
         comparison = {}
+        unique = list(dict.fromkeys(symbols))  # drop repeats like "AAPL vs AAPL", keeping order
         
-        for symbol in symbols:
-            stock_info = self.market_api.get_stock_info(symbol)
+        self.market_api.prime_tickers(unique)
+        quotes = await self._fetch_all(self.market_api.get_stock_info, unique)
+        
+        for symbol, stock_info in quotes.items():
             if 'error' not in stock_info:
                 comparison[symbol] = stock_info
         
         return {"comparison": comparison}
     
-    def simulate_purchase(self, user_id: str, symbol: str, quantity: float) -> Dict:
-        stock_info = self.market_api.get_stock_info(symbol)
+    async def simulate_purchase(self, user_id: str, symbol: str, quantity: float) -> Dict:
+        # the new quote and the current portfolio value are independent, so fetch them concurrently
+        stock_info, current_portfolio = await asyncio.gather(
+            asyncio.to_thread(self.market_api.get_quote, symbol),  # only the price is needed
+            self.calculate_portfolio_value(user_id)
+        )
         
         if 'error' in stock_info:
             return stock_info
         
-        current_portfolio = self.calculate_portfolio_value(user_id)
         purchase_cost = quantity * stock_info['current_price']
         
         return {
@@ -376,7 +643,81 @@ class AnalyticsEngine:
         }
 
 # =====================================================================
-# 6. MAIN APPLICATION: defines API endpoints and request handling
+# 6. CHAT ROUTER: maps each intent to the handler that validates its entities and builds the reply
+# =====================================================================
+
+class ChatRouter:
+    def __init__(self, db: PortfolioDatabase, market_api: MarketDataAPI, analytics: AnalyticsEngine):
+        self.db = db
+        self.market_api = market_api
+        self.analytics = analytics
+        self.handlers = { #intent action -> handler, looked up once per message
+            "show_portfolio": self._h_portfolio,
+            "add_alert": self._h_alert,
+            "compare_stocks": self._h_compare,
+            "simulate": self._h_simulate,
+            "add_holding": self._h_add_holding,
+            "stock_price": self._h_stock_price
+        }
+        self.requirements = { #intent action -> whether the entities are enough for its handler to act
+            "show_portfolio": lambda entities: True,
+            "add_alert": lambda entities: bool(entities.get('symbols') and entities.get('numbers') and 'condition' in entities),
+            "compare_stocks": lambda entities: len(set(entities.get('symbols', []))) >= 2,
+            "simulate": lambda entities: bool(entities.get('symbols') and entities.get('numbers')),
+            "add_holding": lambda entities: bool(entities.get('symbols')) and len(entities.get('numbers', [])) >= 2,
+            "stock_price": lambda entities: bool(entities.get('symbols'))
+        }
+    
+    # the single check used both by the handlers and by the NLP keyword vote
+    def can_handle(self, action: str, entities: Dict) -> bool:
+        return action in self.requirements and self.requirements[action](entities)
+    
+    async def _h_portfolio(self, intent: Intent, user_input: UserInput) -> Dict:
+        return await self.analytics.calculate_portfolio_value(user_input.user_id)
+    
+    async def _h_alert(self, intent: Intent, user_input: UserInput) -> Dict:
+        if self.can_handle("add_alert", intent.entities):
+            symbol = intent.entities['symbols'][0]
+            price = intent.entities['numbers'][0]
+            condition = intent.entities['condition']
+            await asyncio.to_thread(self.db.add_alert, user_input.user_id, symbol, condition, price)
+            return {"message": f"Alert set for {symbol} when price goes {condition} ${price}"}
+        return {"message": "Please specify symbol, price, and condition (above/below)"}
+    
+    async def _h_compare(self, intent: Intent, user_input: UserInput) -> Dict:
+        if self.can_handle("compare_stocks", intent.entities):
+            symbols = list(dict.fromkeys(intent.entities['symbols']))[:2]  # first 2 distinct symbols; a symbol can't be compared with itself
+            return await self.analytics.compare_stocks(symbols)
+        return {"message": "Please specify at least 2 stock symbols to compare"}
+    
+    async def _h_simulate(self, intent: Intent, user_input: UserInput) -> Dict:
+        if self.can_handle("simulate", intent.entities):
+            symbol = intent.entities['symbols'][0]
+            quantity = intent.entities['numbers'][0]
+            return await self.analytics.simulate_purchase(user_input.user_id, symbol, quantity)
+        return {"message": "Please specify symbol and quantity for simulation"}
+    
+    async def _h_add_holding(self, intent: Intent, user_input: UserInput) -> Dict:
+        if self.can_handle("add_holding", intent.entities):
+            symbol = intent.entities['symbols'][0]
+            quantity = intent.entities['numbers'][0]
+            price = intent.entities['numbers'][1]
+            await asyncio.to_thread(self.db.add_holding, user_input.user_id, symbol, quantity, price)
+            return {"message": f"Added {quantity} shares of {symbol} at ${price} to portfolio"}
+        return {"message": "Please specify symbol, quantity, and purchase price"}
+    
+    async def _h_stock_price(self, intent: Intent, user_input: UserInput) -> Dict:
+        if self.can_handle("stock_price", intent.entities):
+            symbol = intent.entities['symbols'][0]
+            stock_info = await asyncio.to_thread(self.market_api.get_stock_info, symbol)
+            return {"stock_info": stock_info}
+        return {"message": "Please specify a stock symbol (prefix less common tickers with $, e.g. $ROKU)"}
+    
+    async def _h_default(self, intent: Intent, user_input: UserInput) -> Dict:
+        return {"message": "I didn't understand that command. Try asking about your portfolio, setting alerts, or comparing stocks."}
+
+# =====================================================================
+# 7. MAIN APPLICATION: defines API endpoints and request handling
 # =====================================================================
 
 app = FastAPI(title="Portfolio Chatbot API", version="1.0.0")
@@ -395,64 +736,54 @@ db = PortfolioDatabase()
 nlp = NLPProcessor()
 market_api = MarketDataAPI()
 analytics = AnalyticsEngine(db, market_api)
+router = ChatRouter(db, market_api, analytics)
+
+# static allocations served by /recommend, keyed by risk level
+RECOMMENDED_PORTFOLIOS = {
+    "low": [{"symbol": "AAPL", "allocation": 0.4}, {"symbol": "JNJ", "allocation": 0.6}],
+    "medium": [{"symbol": "AAPL", "allocation": 0.3}, {"symbol": "TSLA", "allocation": 0.4}, {"symbol": "JNJ", "allocation": 0.3}],
+    "high": [{"symbol": "TSLA", "allocation": 0.5}, {"symbol": "NVDA", "allocation": 0.5}],
+}
+RECOMMENDED_TICKERS = list(dict.fromkeys(e["symbol"] for p in RECOMMENDED_PORTFOLIOS.values() for e in p))
+RECOMMENDED_QUOTE_TTL = 60  # seconds, these tickers are requested constantly so they can stay cached longer
+
+@app.on_event("startup")
+async def prefetch_recommended_tickers():
+    # run in the background so the server starts answering requests without waiting on Yahoo
+    app.state.prefetch_task = asyncio.create_task(analytics.prefetch(RECOMMENDED_TICKERS, RECOMMENDED_QUOTE_TTL))
+
+@app.on_event("shutdown")
+def close_database():
+    app.state.prefetch_task.cancel()  # no-op if the prefetch already finished
+    db.close()
+
+CACHE_MAX_AGE = 15  # seconds clients may reuse a GET response without revalidating
+
+# builds a short ETag from anything that changes when the response would change
+def make_etag(fingerprint) -> str:
+    return '"' + hashlib.blake2b(str(fingerprint).encode(), digest_size=8).hexdigest() + '"'
+
+# headers that let the client cache a response and revalidate it later
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": f"max-age={CACHE_MAX_AGE}"}
+
+# returns a 304 response if the client already has this version
+def check_etag(request: Request, etag: str) -> Optional[Response]:
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
 
 @app.post("/chat")
 async def chat_endpoint(user_input: UserInput):
     """Main chatbot endpoint that processes natural language commands"""
     
     # Process the message through NLP
-    intent = nlp.classify_intent(user_input.message)
+    intent = nlp.classify_intent(user_input.message, router.can_handle)
     
     try:
         # Route to appropriate handler based on intent
-        if intent.action == "show_portfolio":
-            response = analytics.calculate_portfolio_value(user_input.user_id)
-            
-        elif intent.action == "add_alert":
-            if 'symbols' in intent.entities and 'numbers' in intent.entities and 'condition' in intent.entities:
-                symbol = intent.entities['symbols'][0]
-                price = intent.entities['numbers'][0]
-                condition = intent.entities['condition']
-                db.add_alert(user_input.user_id, symbol, condition, price)
-                response = {"message": f"Alert set for {symbol} when price goes {condition} ${price}"}
-            else:
-                response = {"message": "Please specify symbol, price, and condition (above/below)"}
-                
-        elif intent.action == "compare_stocks":
-            if 'symbols' in intent.entities and len(intent.entities['symbols']) >= 2:
-                symbols = intent.entities['symbols'][:2]  # Compare first 2 symbols
-                response = analytics.compare_stocks(symbols)
-            else:
-                response = {"message": "Please specify at least 2 stock symbols to compare"}
-                
-        elif intent.action == "simulate":
-            if 'symbols' in intent.entities and 'numbers' in intent.entities:
-                symbol = intent.entities['symbols'][0]
-                quantity = intent.entities['numbers'][0]
-                response = analytics.simulate_purchase(user_input.user_id, symbol, quantity)
-            else:
-                response = {"message": "Please specify symbol and quantity for simulation"}
-                
-        elif intent.action == "add_holding":
-            if 'symbols' in intent.entities and len(intent.entities['numbers']) >= 2:
-                symbol = intent.entities['symbols'][0]
-                quantity = intent.entities['numbers'][0]
-                price = intent.entities['numbers'][1]
-                db.add_holding(user_input.user_id, symbol, quantity, price)
-                response = {"message": f"Added {quantity} shares of {symbol} at ${price} to portfolio"}
-            else:
-                response = {"message": "Please specify symbol, quantity, and purchase price"}
-                
-        elif intent.action == "stock_price":
-            if 'symbols' in intent.entities:
-                symbol = intent.entities['symbols'][0]
-                stock_info = market_api.get_stock_info(symbol)
-                response = {"stock_info": stock_info}
-            else:
-                response = {"message": "Please specify a stock symbol"}
-                
-        else:
-            response = {"message": "I didn't understand that command. Try asking about your portfolio, setting alerts, or comparing stocks."}
+        handler = router.handlers.get(intent.action, router._h_default)
+        response = await handler(intent, user_input)
     
     except Exception as e:
         response = {"error": f"An error occurred: {str(e)}"}
@@ -466,42 +797,78 @@ async def chat_endpoint(user_input: UserInput):
         "response": response
     }
 
+# the portfolio changes when its holdings change or any of their cached quotes is refreshed
+# returns None if a quote or company name isn't cached, since the response would then be built
+# from a new fetch (or hold a placeholder "N/A" name) and must not be reused
+def portfolio_etag(user_id: str, holdings: List[tuple]) -> Optional[str]:
+    fetched_at = tuple(market_api.quote_timestamp(symbol) for symbol, _ in holdings)
+    if None in fetched_at or not all(market_api.has_name(symbol) for symbol, _ in holdings):
+        return None
+    return make_etag((user_id, holdings, fetched_at))
+
 @app.get("/portfolio/{user_id}")
-async def get_portfolio(user_id: str):
+async def get_portfolio(user_id: str, request: Request, response: Response):
     """Get portfolio summary for a user"""
-    return analytics.calculate_portfolio_value(user_id)
+    holdings = await asyncio.to_thread(db.holdings_fingerprint, user_id)
+    etag = portfolio_etag(user_id, holdings)
+    if etag is not None:
+        not_modified = check_etag(request, etag)
+        if not_modified:
+            return not_modified
+    
+    portfolio = await analytics.calculate_portfolio_value(user_id)
+    
+    # prices may have just been (re)fetched, so tag the response with the quotes it was built from
+    etag = portfolio_etag(user_id, holdings)
+    if etag is not None:
+        response.headers.update(cache_headers(etag))
+    return portfolio
 
 @app.get("/alerts/{user_id}")
-async def get_alerts(user_id: str):
+async def get_alerts(user_id: str, request: Request, response: Response):
     """Get active alerts for a user"""
-    return {"alerts": db.get_alerts(user_id)}
+    alerts = await asyncio.to_thread(db.alerts_fingerprint, user_id)
+    etag = make_etag((user_id, alerts))
+    not_modified = check_etag(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers.update(cache_headers(etag))
+    return {"alerts": await asyncio.to_thread(db.get_alerts, user_id)}
 
 @app.get("/stock/{symbol}")
-async def get_stock_info(symbol: str):
+async def get_stock_info(symbol: str, request: Request, response: Response):
     """Get current information for a stock"""
-    return market_api.get_stock_info(symbol)
+    fetched_at = market_api.quote_timestamp(symbol)
+    if fetched_at is not None:
+        not_modified = check_etag(request, make_etag((symbol, fetched_at)))
+        if not_modified:
+            return not_modified
+    
+    stock_info = await asyncio.to_thread(market_api.get_stock_info, symbol)
+    
+    # the quote may have just been (re)fetched, so tag the response with the timestamp it came from
+    # errors (e.g. a rate-limited .info) are never tagged, so clients don't keep them
+    fetched_at = market_api.quote_timestamp(symbol)
+    if fetched_at is not None and 'error' not in stock_info:
+        response.headers.update(cache_headers(make_etag((symbol, fetched_at))))
+    return stock_info
 
 # Keep your original recommendation endpoint for backward compatibility
 @app.post("/recommend")
-def recommend_portfolio(input: UserInput):
+async def recommend_portfolio(input: UserInput):
     # This is your original simple recommendation logic
     risk_level = "medium"  # default
     
     if "low" in input.message.lower():
-        tickers = ["AAPL", "JNJ"]
-        weights = [0.4, 0.6]
+        risk_level = "low"
     elif "high" in input.message.lower():
-        tickers = ["TSLA", "NVDA"]
-        weights = [0.5, 0.5]
-    else:
-        tickers = ["AAPL", "TSLA", "JNJ"]
-        weights = [0.3, 0.4, 0.3]
+        risk_level = "high"
+    
+    skeleton = RECOMMENDED_PORTFOLIOS[risk_level]
+    # quotes were prefetched at startup, so these are normally served straight from the cache
+    quotes = await asyncio.gather(*(asyncio.to_thread(market_api.get_stock_info, e["symbol"]) for e in skeleton))
     
-    portfolio = []
-    for ticker, weight in zip(tickers, weights):
-        info = market_api.get_stock_info(ticker)
-        info["allocation"] = weight
-        portfolio.append(info)
+    portfolio = [{**info, **entry} for info, entry in zip(quotes, skeleton)]
     
     return {"portfolio": portfolio}
 